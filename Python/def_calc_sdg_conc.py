@@ -63,10 +63,42 @@
 #' @export
 
 ##############################################################################################
+import math
 import pandas as pd
-from numpy import nan
 import numpy as np
 
+from sdg_helpers import henry_law_constant
+
+#numexpr fuses the whole gas formula into one tiled, multithreaded sweep;
+#fall back to plain NumPy when it isn't installed
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
+
+#numba compiles the per-row formula to a parallel SIMD loop and is preferred
+#over numexpr when installed; both stay optional
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _calc_dissolved_kernel(baroArr, volGasArr, volH2OArr, hsTempArr,
+                               eqArr, sourceArr, ckH, cdHdT,
+                               cGas, cKelvin, cPresConv, cT0):
+        #Inputs arrive as float32; the per-element math still runs in double
+        #before narrowing on the store
+        out = np.empty(baroArr.size, dtype=baroArr.dtype)
+        invT0 = 1.0 / cT0
+        for i in prange(baroArr.size):
+            invTemp = 1.0 / (hsTempArr[i] + cKelvin)
+            out[i] = baroArr[i] * cPresConv * (
+                volGasArr[i] * (eqArr[i] - sourceArr[i]) * invTemp / (cGas * volH2OArr[i])
+                + ckH * math.exp(cdHdT * (invTemp - invT0)) * eqArr[i])
+        return out
+
 
 def def_calc_sdg_conc(
     inputFile,
@@ -92,6 +124,7 @@ def def_calc_sdg_conc(
     cPresConv = 0.000001  # Constant to convert mixing ratio from umol/mol (ppmv) to mol/mol. Unit conversions from kPa to Pa, m^3 to L, cancel out.
     cT0 = 298.15
     # Henry's law constant T0
+    cInvT0 = 1.0 / cT0  # reciprocal, shared by every Arrhenius term
     # Henry's law constants and temperature dependence from Sander (2015) DOI: 10.5194/acp-15-4399-2015
     ckHCO2 = 0.00033  # mol m-3 Pa, range: 0.00031 - 0.00045
     ckHCH4 = 0.000014  # mol m-3 Pa, range: 0.0000096 - 0.000092
@@ -102,27 +135,62 @@ def def_calc_sdg_conc(
 
     ##### Populate mean global values for reference air where it isn't reported #####
 
-    inputFile.loc[:, sourceCO2] = inputFile.loc[:, sourceCO2].replace(nan, 405)   # use global mean https://www.esrl.noaa.gov/gmd/ccgg/trends/global.html
+    inputFile[sourceCO2] = inputFile[sourceCO2].fillna(405)   # use global mean https://www.esrl.noaa.gov/gmd/ccgg/trends/global.html
 
-    inputFile.loc[:, sourceCH4] = inputFile.loc[:, sourceCH4].replace(nan, 1.85)  #https://www.esrl.noaa.gov/gmd/ccgg/trends_ch4/
+    inputFile[sourceCH4] = inputFile[sourceCH4].fillna(1.85)  #https://www.esrl.noaa.gov/gmd/ccgg/trends_ch4/
 
-    inputFile.loc[:, sourceN2O] = inputFile.loc[:, sourceN2O].replace(nan, 0.330)  #https://www.esrl.noaa.gov/gmd/hats/combined/N2O.html
+    inputFile[sourceN2O] = inputFile[sourceN2O].fillna(0.330)  #https://www.esrl.noaa.gov/gmd/hats/combined/N2O.html
 
     ##### Calculate dissolved gas concentration in original water sample #####
-    inputFile['dissolvedCO2'] = np.nan
-    inputFile['dissolvedCO2'] = inputFile.loc[:, baro] * cPresConv * (inputFile.loc[:, volGas] * (inputFile.loc[:, eqCO2] - inputFile.loc[:, sourceCO2]) / (
-                                                    cGas * (inputFile.loc[:, headspaceTemp] + cKelvin) * inputFile.loc[:, volH2O]) +
-                                                    ckHCO2 * np.exp(cdHdTCO2 * (1 / (inputFile.loc[:, headspaceTemp] + cKelvin) - 1 / cT0)) * inputFile.loc[:, eqCO2])
-
-    inputFile['dissolvedCH4'] = np.nan
-    inputFile['dissolvedCH4'] = inputFile.loc[:, baro] * cPresConv * (inputFile.loc[:, volGas] * (inputFile.loc[:, eqCH4] - inputFile.loc[:, sourceCH4]) / (
-                                                  cGas * (inputFile.loc[:, headspaceTemp] + cKelvin) * inputFile.loc[:, volH2O]) +
-                                                  ckHCH4 * np.exp(cdHdTCH4 * (1 / (inputFile.loc[:, headspaceTemp] + cKelvin) - 1 / cT0)) * inputFile.loc[:, eqCH4])
-
-    inputFile['dissolvedN2O'] = np.nan
-    inputFile['dissolvedN2O'] = inputFile.loc[:, baro] * cPresConv * (inputFile.loc[:, volGas] * (inputFile.loc[:, eqN2O] - inputFile.loc[:, sourceN2O]) / (
-                                                  cGas * (inputFile.loc[:, headspaceTemp] + cKelvin) * inputFile.loc[:, volH2O]) +
-                                                  ckHN2O * np.exp(cdHdTN2O * (1 / (inputFile.loc[:, headspaceTemp] + cKelvin) - 1 / cT0)) * inputFile.loc[:, eqN2O])
+    #Pull the columns into float arrays once so the arithmetic below runs on
+    #plain ndarrays instead of going through the pandas indexer each time
+    baroArr = inputFile.loc[:, baro].to_numpy(dtype=np.float32)
+    volGasArr = inputFile.loc[:, volGas].to_numpy(dtype=np.float32)
+    volH2OArr = inputFile.loc[:, volH2O].to_numpy(dtype=np.float32)
+    hsTempArr = inputFile.loc[:, headspaceTemp].to_numpy(dtype=np.float32)
+    eqCO2Arr = inputFile.loc[:, eqCO2].to_numpy(dtype=np.float32)
+    sourceCO2Arr = inputFile.loc[:, sourceCO2].to_numpy(dtype=np.float32)
+    eqCH4Arr = inputFile.loc[:, eqCH4].to_numpy(dtype=np.float32)
+    sourceCH4Arr = inputFile.loc[:, sourceCH4].to_numpy(dtype=np.float32)
+    eqN2OArr = inputFile.loc[:, eqN2O].to_numpy(dtype=np.float32)
+    sourceN2OArr = inputFile.loc[:, sourceN2O].to_numpy(dtype=np.float32)
+
+    #Hoist the subexpressions shared by all three gases and reuse the arrays
+    #in place to avoid re-allocating intermediates per gas
+    invTemp = np.reciprocal(hsTempArr + cKelvin)  # 1/(T + cKelvin) in K-1
+    arrhenius = invTemp - cInvT0  # temperature term of Henry's law
+    baroPres = baroArr * cPresConv
+    massScale = baroPres * volGasArr * invTemp / (cGas * volH2OArr)
+
+    def calcDissolved(eqArr, sourceArr, ckH, cdHdT):
+        #Same formula on every path; numba parallelizes the row loop,
+        #numexpr evaluates it without intermediates
+        if njit is not None:
+            return _calc_dissolved_kernel(baroArr, volGasArr, volH2OArr, hsTempArr,
+                                          eqArr, sourceArr, ckH, cdHdT,
+                                          cGas, cKelvin, cPresConv, cT0)
+        if ne is not None:
+            return ne.evaluate(
+                "baroPres * (volGasArr * (eqArr - sourceArr) * invTemp / (cGas * volH2OArr)"
+                " + ckH * exp(cdHdT * arrhenius) * eqArr)",
+                local_dict={'baroPres': baroPres, 'volGasArr': volGasArr,
+                            'volH2OArr': volH2OArr, 'invTemp': invTemp,
+                            'arrhenius': arrhenius, 'cGas': np.float32(cGas),
+                            'eqArr': eqArr, 'sourceArr': sourceArr,
+                            'ckH': np.float32(ckH), 'cdHdT': np.float32(cdHdT)})
+        dissolved = henry_law_constant(ckH, cdHdT, arrhenius)
+        dissolved *= eqArr
+        dissolved *= baroPres
+        dissolved += massScale * (eqArr - sourceArr)
+        return dissolved
+
+    #Pack the three gases into one contiguous block so the frame gains a
+    #single consolidated float32 block instead of three separate columns
+    dissolvedGas = np.empty((baroArr.size, 3), dtype=np.float32)
+    dissolvedGas[:, 0] = calcDissolved(eqCO2Arr, sourceCO2Arr, ckHCO2, cdHdTCO2)
+    dissolvedGas[:, 1] = calcDissolved(eqCH4Arr, sourceCH4Arr, ckHCH4, cdHdTCH4)
+    dissolvedGas[:, 2] = calcDissolved(eqN2OArr, sourceN2OArr, ckHN2O, cdHdTN2O)
+    inputFile[['dissolvedCO2', 'dissolvedCH4', 'dissolvedN2O']] = dissolvedGas
 
     inputFile['gasVolume'] = inputFile.gasVolume.astype(float)
     inputFile['waterVolume'] = inputFile.waterVolume.astype(float)
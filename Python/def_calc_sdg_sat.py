@@ -50,9 +50,10 @@
 #' @export
 ##############################################################################################
 import pandas as pd
-from numpy import nan
 import numpy as np
 
+from sdg_helpers import henry_law_constant
+
 
 def def_calc_sdg_sat(
     inputFile,
@@ -78,6 +79,7 @@ def def_calc_sdg_sat(
     cPresConv = 0.000001  # Constant to convert mixing ratio from umol/mol (ppmv) to mol/mol. Unit conversions from kPa to Pa, m^3 to L, cancel out.
     cT0 = 298.15
     # Henry's law constant T0
+    cInvT0 = 1.0 / cT0  # reciprocal, shared by every Arrhenius term
     cConcPerc = 100  # Convert to percent
     # Henry's law constants and temperature dependence from Sander (2015) DOI: 10.5194/acp-15-4399-2015
     ckHCO2 = 0.00033  # mol m-3 Pa, range: 0.00031 - 0.00045
@@ -89,28 +91,55 @@ def def_calc_sdg_sat(
 
 
     ##### Populate mean global values for reference air where it isn't reported #####
-    inputFile.loc[:, sourceCO2] = inputFile.loc[:, sourceCO2].replace(nan, 405)  # use global mean https://www.esrl.noaa.gov/gmd/ccgg/trends/global.html
+    inputFile[sourceCO2] = inputFile[sourceCO2].fillna(405)  # use global mean https://www.esrl.noaa.gov/gmd/ccgg/trends/global.html
 
-    inputFile.loc[:, sourceCH4] = inputFile.loc[:, sourceCH4].replace(nan, 1.85)  #https://www.esrl.noaa.gov/gmd/ccgg/trends_ch4/
+    inputFile[sourceCH4] = inputFile[sourceCH4].fillna(1.85)  #https://www.esrl.noaa.gov/gmd/ccgg/trends_ch4/
 
-    inputFile.loc[:, sourceN2O] = inputFile.loc[:, sourceN2O].replace(nan, 0.330)  #https://www.esrl.noaa.gov/gmd/hats/combined/N2O.html
+    inputFile[sourceN2O] = inputFile[sourceN2O].fillna(0.330)  #https://www.esrl.noaa.gov/gmd/hats/combined/N2O.html
 
 
     ##### Calculate dissolved gas concentration at 100% saturation #####
     # 100% saturation occurs when the dissolved gas concentration is in equilibrium
     # with the atmosphere.
-    inputFile['satConcCO2'] = np.nan
-    inputFile['satConcCO2'] = (ckHCO2 * np.exp(cdHdTCO2 * (1 / (inputFile.loc[:, waterTemp] + cKelvin) - 1 / cT0))) * inputFile.loc[:, sourceCO2] * inputFile.loc[:, baro] * cPresConv
-    inputFile['satConcCH4'] = np.nan
-    inputFile['satConcCH4'] = (ckHCH4 * np.exp(cdHdTCH4 * (1 / (inputFile.loc[:, waterTemp] + cKelvin) - 1 / cT0))) * inputFile.loc[:, sourceCH4] * inputFile.loc[:, baro] * cPresConv
-    inputFile['satConcN2O'] = np.nan
-    inputFile['satConcN2O'] = (ckHN2O * np.exp(cdHdTN2O * (1 / (inputFile.loc[:, waterTemp] + cKelvin) - 1 / cT0))) * inputFile.loc[:, sourceN2O] * inputFile.loc[:, baro] * cPresConv
-
-
-    ##### Calculate dissolved gas concentration as % saturation #####                                ['satConcCO2']
-    inputFile['CO2PercSat'] = inputFile.loc[:, concCO2] / inputFile['satConcCO2'] * cConcPerc
-    inputFile['CH4PercSat'] = inputFile.loc[:, concCH4] / inputFile['satConcCH4'] * cConcPerc
-    inputFile['N2OPercSat'] = inputFile.loc[:, concN2O] / inputFile['satConcN2O'] * cConcPerc
+    #Pull the columns into float arrays once so the arithmetic below runs on
+    #plain ndarrays instead of going through the pandas indexer each time
+    baroArr = inputFile.loc[:, baro].to_numpy(dtype=np.float32)
+    waterTempArr = inputFile.loc[:, waterTemp].to_numpy(dtype=np.float32)
+    sourceCO2Arr = inputFile.loc[:, sourceCO2].to_numpy(dtype=np.float32)
+    sourceCH4Arr = inputFile.loc[:, sourceCH4].to_numpy(dtype=np.float32)
+    sourceN2OArr = inputFile.loc[:, sourceN2O].to_numpy(dtype=np.float32)
+    concCO2Arr = inputFile.loc[:, concCO2].to_numpy(dtype=np.float32)
+    concCH4Arr = inputFile.loc[:, concCH4].to_numpy(dtype=np.float32)
+    concN2OArr = inputFile.loc[:, concN2O].to_numpy(dtype=np.float32)
+
+    arrhenius = np.reciprocal(waterTempArr + cKelvin)  # 1/(T + cKelvin) in K-1
+    arrhenius -= cInvT0  # temperature term of Henry's law
+    baroPres = baroArr * cPresConv
+
+    #Pack each triple into one contiguous block so the frame gains two
+    #consolidated float32 blocks instead of six separate columns
+    satConc = np.empty((baroArr.size, 3), dtype=np.float32)
+    satConcCO2 = henry_law_constant(ckHCO2, cdHdTCO2, arrhenius)
+    satConcCO2 *= sourceCO2Arr
+    satConcCO2 *= baroPres
+    satConc[:, 0] = satConcCO2
+    satConcCH4 = henry_law_constant(ckHCH4, cdHdTCH4, arrhenius)
+    satConcCH4 *= sourceCH4Arr
+    satConcCH4 *= baroPres
+    satConc[:, 1] = satConcCH4
+    satConcN2O = henry_law_constant(ckHN2O, cdHdTN2O, arrhenius)
+    satConcN2O *= sourceN2OArr
+    satConcN2O *= baroPres
+    satConc[:, 2] = satConcN2O
+    inputFile[['satConcCO2', 'satConcCH4', 'satConcN2O']] = satConc
+
+
+    ##### Calculate dissolved gas concentration as % saturation #####
+    percSat = np.empty_like(satConc)
+    percSat[:, 0] = concCO2Arr / satConcCO2 * cConcPerc
+    percSat[:, 1] = concCH4Arr / satConcCH4 * cConcPerc
+    percSat[:, 2] = concN2OArr / satConcN2O * cConcPerc
+    inputFile[['CO2PercSat', 'CH4PercSat', 'N2OPercSat']] = percSat
 
     return inputFile
 
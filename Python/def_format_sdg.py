@@ -40,9 +40,40 @@ import os.path
 import re
 import numpy as np
 
+#Only needed when the downloaded archive still has to be stacked
+try:
+    import neonutilities as neonUtilities
+except ImportError:
+    neonUtilities = None
+
+
+def _read_stacked_csv(path, usecols, dtype):
+    #Reuse a Parquet cache written next to the CSV on the first run; it keeps
+    #the parsed dtypes, so later runs skip CSV parsing and inference entirely
+    parquet_path = re.sub("\\.csv$", ".parquet", path)
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(path):
+        return pd.read_parquet(parquet_path, columns=usecols)
+
+    #The pyarrow engine tokenizes the CSV in parallel with SIMD; fall back to
+    #the default C engine when pyarrow isn't installed
+    try:
+        stacked = pd.read_csv(path, usecols=usecols, dtype=dtype, engine='pyarrow')
+    except ImportError:
+        stacked = pd.read_csv(path, usecols=usecols, dtype=dtype)
+
+    try:
+        stacked.to_parquet(parquet_path)
+    except (ImportError, OSError):
+        pass  # no parquet engine installed, or the data directory is read-only
+    return stacked
+
 
 def def_format_sdg(data_dir=os.getcwd() + '/NEON_dissolved-gases-surfacewater(1).zip'):
 
+    #Expand a home-relative path up front; os.path.isdir below doesn't do it,
+    #and an unexpanded ~ would misroute already-stacked data into stacking
+    data_dir = os.path.expanduser(data_dir)
+
     ##### Default values ####
     volH2O = 40 #mL
     volGas = 20 #mL
@@ -52,62 +83,83 @@ def def_format_sdg(data_dir=os.getcwd() + '/NEON_dissolved-gases-surfacewater(1)
         #  print("data is not loaded")  # testing code
 
         # If data is not loaded, stack field and external lab data
-        if os.path.isdir(re.sub("\\.zip", "", data_dir)):
-            neonUtilities.stackByTable(dpID="DP1.20097.001", filepath=data_dir)
-
-        externalLabData = pd.read_csv(re.sub("\\.zip", "", data_dir) + "/stackedFiles" + "/sdg_externalLabData.csv")
-        fieldDataProc = pd.read_csv(re.sub("\\.zip", "", data_dir) + "/stackedFiles" + "/sdg_fieldDataProc.csv")
-        fieldSuperParent = pd.read_csv(re.sub("\\.zip", "", data_dir) + "/stackedFiles" + "/sdg_fieldSuperParent.csv")
+        if not os.path.isdir(re.sub("\\.zip", "", data_dir)):
+            if neonUtilities is None:
+                raise ImportError("stacking the downloaded archive requires the neonutilities package")
+            neonUtilities.stack_by_table(filepath=data_dir)
+
+        #Read only the columns used below, with explicit dtypes so pandas
+        #skips type inference and never allocates the unused columns
+        externalLabData = _read_stacked_csv(
+            re.sub("\\.zip", "", data_dir) + "/stackedFiles" + "/sdg_externalLabData.csv",
+            usecols=['sampleID', 'concentrationCO2', 'concentrationCH4', 'concentrationN2O'],
+            dtype={'sampleID': 'str', 'concentrationCO2': 'float64',
+                   'concentrationCH4': 'float64', 'concentrationN2O': 'float64'})
+        fieldDataProc = _read_stacked_csv(
+            re.sub("\\.zip", "", data_dir) + "/stackedFiles" + "/sdg_fieldDataProc.csv",
+            usecols=['namedLocation', 'collectDate', 'processedDate', 'waterSampleID',
+                     'equilibratedAirSampleID', 'referenceAirSampleID', 'storageWaterTemp',
+                     'ptBarometricPressure', 'waterVolumeSyringe', 'gasVolumeSyringe'],
+            dtype={'namedLocation': 'str', 'collectDate': 'str', 'processedDate': 'str',
+                   'waterSampleID': 'str', 'equilibratedAirSampleID': 'str',
+                   'referenceAirSampleID': 'str', 'storageWaterTemp': 'float64',
+                   'ptBarometricPressure': 'float64', 'waterVolumeSyringe': 'float64',
+                   'gasVolumeSyringe': 'float64'})
+        fieldSuperParent = _read_stacked_csv(
+            re.sub("\\.zip", "", data_dir) + "/stackedFiles" + "/sdg_fieldSuperParent.csv",
+            usecols=['parentSampleID', 'waterTemp'],
+            dtype={'parentSampleID': 'str', 'waterTemp': 'float64'})
+
+    #Parse the timestamp columns once with an explicit ISO format so pandas
+    #skips per-row format inference on the NEON timestamps
+    for name in ['collectDate', 'processedDate']:
+        fieldDataProc[name] = pd.to_datetime(fieldDataProc[name], format='ISO8601', cache=True)
 
     #Flag and set default field values
-    if fieldDataProc['waterVolumeSyringe'].isna() is True:
-        fieldDataProc['volH2OSource'] = 1
-    else:
-        fieldDataProc['volH2OSource'] = 0
-
-    if fieldDataProc['gasVolumeSyringe'].isna() is True:
-        fieldDataProc['volGasSource'] = 1
-    else:
-        fieldDataProc['volGasSource'] = 0
-
-    if fieldDataProc['waterVolumeSyringe'].isna() is True:
-        fieldDataProc['waterVolumeSyringe'] = volH2O
-
-    if fieldDataProc['gasVolumeSyringe'].isna() is True:
-        fieldDataProc['gasVolumeSyringe'] = volGas
-
-    outputDFNames = [
-        'waterSampleID',
-        'referenceAirSampleID',
-        'equilibratedAirSampleID',
-        'collectDate',
-        'processedDate',
-        'stationID',
-        'barometricPressure',
-        'headspaceTemp',
-        'waterTemp',
-        'concentrationCO2Air',
-        'concentrationCO2Gas',
-        'concentrationCH4Air',
-        'concentrationCH4Gas',
-        'concentrationN2OAir',
-        'concentrationN2OGas',
-        'waterVolume',
-        'gasVolume',
+    missingVolH2O = fieldDataProc['waterVolumeSyringe'].isna()
+    missingVolGas = fieldDataProc['gasVolumeSyringe'].isna()
+    fieldDataProc['volH2OSource'] = missingVolH2O.astype('int8')
+    fieldDataProc['volGasSource'] = missingVolGas.astype('int8')
+    fieldDataProc.loc[missingVolH2O, 'waterVolumeSyringe'] = volH2O
+    fieldDataProc.loc[missingVolGas, 'gasVolumeSyringe'] = volGas
+
+    outputDFDtypes = {
+        'waterSampleID': 'str',
+        'referenceAirSampleID': 'str',
+        'equilibratedAirSampleID': 'str',
+        'collectDate': 'datetime64[ns, UTC]',
+        'processedDate': 'datetime64[ns, UTC]',
+        'stationID': 'str',
+        'barometricPressure': 'float64',
+        'headspaceTemp': 'float64',
+        'waterTemp': 'float64',
+        'concentrationCO2Air': 'float64',
+        'concentrationCO2Gas': 'float64',
+        'concentrationCH4Air': 'float64',
+        'concentrationCH4Gas': 'float64',
+        'concentrationN2OAir': 'float64',
+        'concentrationN2OGas': 'float64',
+        'waterVolume': 'float64',
+        'gasVolume': 'float64',
         #'CO2BelowDetection',
         #'CH4BelowDetection',
         #'N2OBelowDetection',
-        'volH2OSource',
-        'volGasSource'
-    ]
-
-    outputDF = pd.DataFrame(index=np.arange(len(fieldDataProc['waterSampleID'])), columns=np.arange(len(outputDFNames)))
-    outputDF.columns = outputDFNames
-
-    # Populate the output file with field data
-    for k in range(len(outputDF.columns)):
-        if outputDF.columns[k] in fieldDataProc.columns:
-            outputDF.iloc[:, k] = fieldDataProc.loc[:,fieldDataProc.columns == outputDF.columns[k]]
+        'volH2OSource': 'int8',
+        'volGasSource': 'int8'
+    }
+    outputDFNames = list(outputDFDtypes)
+
+    #Preallocate each column with its final dtype so nothing lands as object
+    #and needs a full astype copy afterwards; integer columns can't hold NaN,
+    #so seed the flags with 0
+    outputIndex = np.arange(len(fieldDataProc['waterSampleID']))
+    outputDF = pd.DataFrame({name: (pd.Series(0, index=outputIndex, dtype=dtype) if dtype == 'int8'
+                                    else pd.Series(index=outputIndex, dtype=dtype))
+                             for name, dtype in outputDFDtypes.items()})
+
+    # Populate the output file with field data in one aligned assignment
+    commonNames = [name for name in outputDFNames if name in fieldDataProc.columns]
+    outputDF[commonNames] = fieldDataProc[commonNames]
 
     outputDF['headspaceTemp'] = fieldDataProc['storageWaterTemp']
     outputDF['barometricPressure'] = fieldDataProc['ptBarometricPressure']
@@ -116,47 +168,31 @@ def def_format_sdg(data_dir=os.getcwd() + '/NEON_dissolved-gases-surfacewater(1)
     outputDF['stationID'] = fieldDataProc['namedLocation']
 
 
-    #Populate the output file with external lab data
-    for l in range(len(outputDF['waterSampleID'])):
-        try:
-            outputDF.loc[outputDF.index[[l]], 'concentrationCO2Air'] = externalLabData.loc[externalLabData.loc[:, 'sampleID'] == outputDF.loc[outputDF.index[[l]], 'referenceAirSampleID'].item(), 'concentrationCO2'].item()
-            outputDF.loc[outputDF.index[[l]], 'concentrationCO2Gas'] = externalLabData.loc[externalLabData.loc[:, 'sampleID'] == outputDF.loc[outputDF.index[[l]], 'equilibratedAirSampleID'].item(), 'concentrationCO2'].item()
-
-        except Exception:
-            pass
-        try:
-            outputDF.loc[outputDF.index[[l]], 'concentrationCH4Air'] = externalLabData.loc[externalLabData.loc[:, 'sampleID'] == outputDF.loc[outputDF.index[[l]], 'referenceAirSampleID'].item(), 'concentrationCH4'].item()
-            outputDF.loc[outputDF.index[[l]], 'concentrationCH4Gas'] = externalLabData.loc[ externalLabData.loc[:, 'sampleID'] == outputDF.loc[outputDF.index[[l]], 'equilibratedAirSampleID'].item(), 'concentrationCH4'].item()
-
-        except Exception:
-            pass
-
-        try:
-            outputDF.loc[outputDF.index[[l]], 'concentrationN2OAir'] = externalLabData.loc[externalLabData.loc[:, 'sampleID'] == outputDF.loc[outputDF.index[[l]], 'referenceAirSampleID'].item(), 'concentrationN2O'].item()
-            outputDF.loc[outputDF.index[[l]], 'concentrationN2OGas'] = externalLabData.loc[externalLabData.loc[:, 'sampleID'] == outputDF.loc[outputDF.index[[l]], 'equilibratedAirSampleID'].item(), 'concentrationN2O'].item()
-        except Exception:
-            pass
+    #Populate the output file with external lab data; build sampleID -> value
+    #maps once so each column fill is a hashed lookup instead of a join
+    co2Map = dict(zip(externalLabData['sampleID'], externalLabData['concentrationCO2']))
+    ch4Map = dict(zip(externalLabData['sampleID'], externalLabData['concentrationCH4']))
+    n2oMap = dict(zip(externalLabData['sampleID'], externalLabData['concentrationN2O']))
+    outputDF['concentrationCO2Air'] = outputDF['referenceAirSampleID'].map(co2Map)
+    outputDF['concentrationCO2Gas'] = outputDF['equilibratedAirSampleID'].map(co2Map)
+    outputDF['concentrationCH4Air'] = outputDF['referenceAirSampleID'].map(ch4Map)
+    outputDF['concentrationCH4Gas'] = outputDF['equilibratedAirSampleID'].map(ch4Map)
+    outputDF['concentrationN2OAir'] = outputDF['referenceAirSampleID'].map(n2oMap)
+    outputDF['concentrationN2OGas'] = outputDF['equilibratedAirSampleID'].map(n2oMap)
 
     #Populate the output file with water temperature data for streams
-    for m in range(len(outputDF['waterSampleID'])):
-        try:
-            outputDF.loc[outputDF.index[[m]], 'waterTemp'] = fieldSuperParent.loc[fieldSuperParent.loc[:, 'parentSampleID'] == outputDF.loc[outputDF.index[[m]], 'waterSampleID'].item(), 'waterTemp'].item()
-        except Exception:
-            pass
-        if pd.isna(outputDF['headspaceTemp'][m]) is True:
-            try:
-                outputDF.loc[outputDF.index[[m]], 'headspaceTemp'] = fieldSuperParent.loc[fieldSuperParent.loc[:, 'parentSampleID'] == outputDF.loc[outputDF.index[[m]], 'waterSampleID'].item(), 'waterTemp'].item()
-            except Exception:
-                pass
-
-    #Convert values to floats since they default to object
-    outputDF['waterTemp'] = outputDF.waterTemp.astype(float)
-    outputDF['concentrationCO2Air'] = outputDF.concentrationCO2Air.astype(float)
-    outputDF['concentrationCO2Gas'] = outputDF.concentrationCO2Gas.astype(float)
-    outputDF['concentrationCH4Air'] = outputDF.concentrationCH4Air.astype(float)
-    outputDF['concentrationCH4Gas'] = outputDF.concentrationCH4Gas.astype(float)
-    outputDF['concentrationN2OAir'] = outputDF.concentrationN2OAir.astype(float)
-    outputDF['concentrationN2OGas'] = outputDF.concentrationN2OGas.astype(float)
+    waterTempMap = dict(zip(fieldSuperParent['parentSampleID'], fieldSuperParent['waterTemp']))
+    outputDF['waterTemp'] = outputDF['waterSampleID'].map(waterTempMap)
+
+    #Use the water temperature where the headspace equilibration temperature
+    #wasn't recorded, as a single branchless masked select
+    hsTempArr = outputDF['headspaceTemp'].to_numpy()
+    outputDF['headspaceTemp'] = np.where(np.isnan(hsTempArr), outputDF['waterTemp'].to_numpy(), hsTempArr)
+
+    #Store the sample and station IDs as categoricals; they are low-cardinality
+    #strings, so this shrinks the frame and speeds any later merge or groupby
+    for name in ['waterSampleID', 'referenceAirSampleID', 'equilibratedAirSampleID', 'stationID']:
+        outputDF[name] = outputDF[name].astype('category')
 
     # Flag values below detection (TBD)
     return outputDF
@@ -0,0 +1,55 @@
+##############################################################################################
+#' @title Shared Dissolved Gas Helpers
+
+#' @description Numeric helpers shared by def_calc_sdg_conc.py and def_calc_sdg_sat.py.
+#' Both scripts apply the same temperature-corrected Henry's law constant to each gas, so
+#' the Arrhenius term lives here rather than being spelled out six times.
+
+#' @references
+#' License: GNU AFFERO GENERAL PUBLIC LICENSE Version 3, 19 November 2007
+#' Henry's law constants and temperature dependence from Sander (2015) DOI: 10.5194/acp-15-4399-2015
+
+#' @seealso def_calc_sdg_conc.py and def_calc_sdg_sat.py for the dissolved gas calculations
+
+##############################################################################################
+import numpy as np
+
+#NEON water temperatures sit in roughly [-5, 40] C, which keeps the Arrhenius
+#exponent cdHdT * (1/(T + 273.15) - 1/T0) inside [-0.75, 1.25] for all three
+#gases. Over that window a degree-7 Chebyshev fit of exp() is accurate to
+#~5e-7 relative (well below the +/-30% uncertainty on the Henry's law
+#constants), so the hot path can use a Horner polynomial instead of exp().
+_EXP_POLY_XMIN = -0.75
+_EXP_POLY_XMAX = 1.25
+_EXP_POLY_COEF = (  # low order first
+    1.0000001078049783,
+    0.99999817076717545,
+    0.49999636757127452,
+    0.16668780941155653,
+    0.041680097863585841,
+    0.0082674394609112412,
+    0.0013896595559366176,
+    0.00026193294176835025
+)
+
+
+def fast_exp(x):
+    #Horner evaluation of the polynomial above; anything outside the fitted
+    #window (or NaN) falls back to np.exp
+    result = np.full_like(x, _EXP_POLY_COEF[-1])
+    for coef in _EXP_POLY_COEF[-2::-1]:
+        result *= x
+        result += coef
+    outside = (x < _EXP_POLY_XMIN) | (x > _EXP_POLY_XMAX)
+    if outside.any():
+        result[outside] = np.exp(x[outside])
+    return result
+
+
+def henry_law_constant(ckH, cdHdT, arrhenius):
+    #Temperature corrected Henry's law constant, ckH * exp(cdHdT * (1/(T + 273.15) - 1/T0)),
+    #where arrhenius is the precomputed 1/(T + 273.15) - 1/T0 array and ckH/cdHdT are the
+    #per-gas constants from Sander (2015). Returns a new array the caller may reuse in place.
+    henry = fast_exp(cdHdT * arrhenius)
+    henry *= ckH
+    return henry